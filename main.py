@@ -1,7 +1,7 @@
 import os
 import json
 import tkinter as tk
-from tkinter import filedialog
+from tkinter import filedialog, messagebox
 import customtkinter
 from PIL import Image, ImageTk, ImageFilter, ImageDraw, ImageEnhance
 import vlc
@@ -10,6 +10,22 @@ import io
 import platform
 import random
 import time
+import re
+import heapq
+import hashlib
+import weakref
+import secrets
+import queue
+import asyncio
+import threading
+import urllib.parse
+import concurrent.futures
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
 
 # --- App Configuration & Theme ---
 APP_NAME = "All Player"
@@ -34,6 +50,13 @@ SYMBOL_FONT = ("Segoe UI Symbol", 20)
 # Dimensions & Padding
 CORNER_RADIUS = 8
 GENERAL_PADDING = 10
+ALBUM_ART_MAX_SIZE = (1024, 1024)
+CARD_BATCH_SIZE = 25  # Library cards built per UI tick during imports
+
+# Control API (loopback only)
+CONTROL_HOST = "127.0.0.1"
+CONTROL_PORT = 8765
+CONTROL_TOKEN_FILE = "control_token"  # Written next to session.json on every run.
 
 # Configure CustomTkinter
 customtkinter.set_appearance_mode("dark")
@@ -66,8 +89,12 @@ class VLCPlayer:
             except Exception as e:
                 print(f"Error setting video output: {e}")
 
-    def play(self, filepath):
+    def play(self, filepath, start_ms=0, paused=False):
         media = self.instance.media_new(filepath)
+        if start_ms > 0:
+            media.add_option(f"start-time={start_ms / 1000:.3f}")
+        if paused:
+            media.add_option("start-paused")
         self.mediaplayer.set_media(media)
         if self.video_frame and filepath.lower().endswith(('.mp4', '.mkv', '.avi', '.mov')):
             self.set_video_frame(self.video_frame)
@@ -113,6 +140,803 @@ class VLCPlayer:
         except Exception:
             return None
 
+# ----------------------------
+# Image Management
+# ----------------------------
+class ImageManager:
+    """ Decodes pictures at the resolution they are shown at and keeps decoded pixels under fixed budgets.
+
+        The display cache and library card thumbnails each have their own cap: the cache evicts least recently
+        used entries, and once the thumbnail budget is spent new cards are shown without one. Now-playing art
+        and backdrops are only counted, since at most a few of them are alive at a time. """
+    CACHE_PIXEL_BUDGET = 24_000_000      # Display cache (~96 MB at RGBA).
+    THUMBNAIL_PIXEL_BUDGET = 36_000_000  # Card thumbnails, i.e. 10,000 at 60x60 (~144 MB at RGBA).
+    MAX_SOURCE_PIXELS = 120_000_000      # Refuse anything that would still be larger than this after a reduced decode.
+
+    def __init__(self, cache_budget=CACHE_PIXEL_BUDGET, thumbnail_budget=THUMBNAIL_PIXEL_BUDGET):
+        self.cache_budget = cache_budget
+        self.thumbnail_budget = thumbnail_budget
+        self.cache = OrderedDict()
+        self.cache_pixels = 0
+        self.widget_pixels = {"thumbnails": 0, "art": 0}
+
+    def track(self, image, kind="art"):
+        """ Counts an image held outside the cache until it is garbage collected. Returns the image. """
+        pixels = image.width * image.height
+        self.widget_pixels[kind] += pixels
+        weakref.finalize(image, self._release, kind, pixels)
+        return image
+
+    def _release(self, kind, pixels):
+        self.widget_pixels[kind] -= pixels
+
+    def ctk_image(self, image, size, cached=False):
+        """ Wraps a Pillow image for CTk widgets. CTkImage falls back to the light image in dark mode,
+            so passing it once keeps a single image and a single scaled PhotoImage cache.
+            Images that didn't come from load() are counted as art. """
+        if not cached: self.track(image)
+        return customtkinter.CTkImage(light_image=image, size=size)
+
+    def card_thumbnail(self, image, size):
+        """ Like ctk_image(), for library cards. Returns None once the thumbnail budget is spent. """
+        if self.widget_pixels["thumbnails"] + image.width * image.height > self.thumbnail_budget:
+            return None
+        self.track(image, "thumbnails")
+        return customtkinter.CTkImage(light_image=image, size=size)
+
+    def _evict(self):
+        """ Drops least recently used cache entries while over budget, always keeping the newest one. """
+        while self.cache_pixels > self.cache_budget and len(self.cache) > 1:
+            _, evicted = self.cache.popitem(last=False)
+            self.cache_pixels -= evicted.width * evicted.height
+
+    def reduce(self, image, max_size):
+        """ Returns a copy of an opened image that fits within max_size, decoding as little as possible. """
+        # JPEG can decode straight to 1/2, 1/4 or 1/8 scale; this is a no-op for other formats.
+        image.draft(None, max_size)
+        width, height = image.size
+        if width * height > self.MAX_SOURCE_PIXELS:
+            raise ValueError(f"Image is too large to open ({width}x{height}).")
+        # Shrink large decodes with a cheap integer box reduction first, so the high-quality
+        # resample only runs on a small image and the full-size buffer can be freed right away.
+        factor = min(width // max(max_size[0], 1), height // max(max_size[1], 1)) // 2
+        if factor > 1:
+            image = image.reduce(factor)
+        image.thumbnail(max_size, Image.Resampling.LANCZOS)
+        return image
+
+    def decode(self, source, max_size):
+        """ Opens a file (or file-like object) and decodes it to fit within max_size, without caching. """
+        with Image.open(source) as image:
+            reduced = self.reduce(image, max_size)
+            if reduced is image: reduced = image.copy()
+        return reduced
+
+    def load(self, filepath, max_size):
+        """ Like decode(), but cached. Least recently used images are evicted to stay under the pixel budget. """
+        key = (filepath, tuple(max_size))
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        image = self.decode(filepath, max_size)
+        self.cache[key] = image
+        self.cache_pixels += image.width * image.height
+        self._evict()
+        return image
+
+    def forget(self, filepath):
+        for key in [key for key in self.cache if key[0] == filepath]:
+            evicted = self.cache.pop(key)
+            self.cache_pixels -= evicted.width * evicted.height
+
+    @staticmethod
+    def peak_rss_mb():
+        """ Peak resident set size of the process in MB, or None where it can't be measured. """
+        if resource is None: return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes.
+        return peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024
+
+    def stats_text(self):
+        text = (f"Image cache: {self.cache_pixels / 1_000_000:.1f} / {self.cache_budget / 1_000_000:.0f} MP"
+                f"  ·  Thumbnails: {self.widget_pixels['thumbnails'] / 1_000_000:.1f} / {self.thumbnail_budget / 1_000_000:.0f} MP"
+                f"  ·  Art: {self.widget_pixels['art'] / 1_000_000:.1f} MP")
+        if (peak := self.peak_rss_mb()) is not None:
+            text += f"  ·  Peak RSS: {peak:.0f} MB"
+        return text
+
+# ----------------------------
+# Library Metadata Store
+# ----------------------------
+class MetadataStore:
+    """ Caches per-file metadata for a library and keeps a small index for fast lookups. """
+    INDEXED_FIELDS = ("artist", "album", "genre")
+
+    def __init__(self, store_file):
+        self.store_file = store_file
+        self.items = {}
+        self.index = {field: {} for field in self.INDEXED_FIELDS}
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        if os.path.exists(self.store_file):
+            try:
+                with open(self.store_file, "r", encoding="utf-8") as f: self.items = json.load(f)
+            except (json.JSONDecodeError, IOError):
+                self.items = {}
+        for filepath, meta in self.items.items(): self._index_add(filepath, meta)
+
+    def save(self):
+        if not self.dirty: return
+        try:
+            with open(self.store_file, "w", encoding="utf-8") as f: json.dump(self.items, f, indent=4)
+            self.dirty = False
+        except IOError:
+            pass
+
+    def _index_add(self, filepath, meta):
+        for field in self.INDEXED_FIELDS:
+            if value := meta.get(field):
+                self.index[field].setdefault(str(value).lower(), set()).add(filepath)
+
+    def _index_remove(self, filepath, meta):
+        for field in self.INDEXED_FIELDS:
+            if value := meta.get(field):
+                key = str(value).lower()
+                bucket = self.index[field].get(key)
+                if bucket is not None:
+                    bucket.discard(filepath)
+                    if not bucket: del self.index[field][key]
+
+    def lookup(self, field, value):
+        """ Returns the files whose indexed field equals value, or None if the field isn't indexed. """
+        if field not in self.index: return None
+        return self.index[field].get(str(value).lower(), set())
+
+    def get(self, filepath):
+        return self.items.get(filepath)
+
+    def _read(self, filepath, tag=None):
+        title, _ = os.path.splitext(os.path.basename(filepath))
+        meta = {"title": title, "artist": None, "album": None, "genre": None, "duration": None, "size": None, "mtime": None}
+        try:
+            stat = os.stat(filepath)
+            meta["size"], meta["mtime"] = stat.st_size, stat.st_mtime
+        except OSError:
+            return meta
+        try:
+            tag = tag or TinyTag.get(filepath)
+            meta.update(title=tag.title or title, artist=tag.artist, album=tag.album, genre=tag.genre, duration=tag.duration)
+        except Exception:
+            pass
+        return meta
+
+    def update(self, filepath, tag=None, existing=False):
+        """ Re-reads a file's metadata if it is new or has changed on disk. Returns True if anything changed.
+            Pass an already-read TinyTag as tag to avoid reading the file twice.
+            existing marks files that were in the library before the store knew about them; their 'added'
+            time comes from the file's modification time rather than now. """
+        old = self.items.get(filepath)
+        if old is not None:
+            try:
+                if os.path.getmtime(filepath) == old.get("mtime"): return False
+            except OSError:
+                return False
+        meta = self._read(filepath, tag)
+        if old:
+            meta["added"] = old["added"]
+        else:
+            meta["added"] = (meta["mtime"] or time.time()) if existing else time.time()
+        if meta == old: return False
+        if old: self._index_remove(filepath, old)
+        self.items[filepath] = meta
+        self._index_add(filepath, meta)
+        self.dirty = True
+        return True
+
+    def remove(self, filepath):
+        if (meta := self.items.pop(filepath, None)) is not None:
+            self._index_remove(filepath, meta)
+            self.dirty = True
+
+    def prune(self, filepaths):
+        """ Drops entries for files no longer in the library. Returns the removed files. """
+        wanted = set(filepaths)
+        removed = [fp for fp in self.items if fp not in wanted]
+        for filepath in removed: self.remove(filepath)
+        return removed
+
+# ----------------------------
+# Smart Playlists
+# ----------------------------
+class SmartRule:
+    """ A parsed smart playlist query, e.g. 'artist = X and duration > 5 min' or 'added in last 30 days'. """
+    # Splits on and/or outside double quotes, so 'artist = "Simon and Garfunkel"' stays one condition.
+    SPLIT_RE = re.compile(r'\s+(and|or)\s+(?=(?:[^"]*"[^"]*")*[^"]*$)', re.IGNORECASE)
+    CONDITION_RE = re.compile(r"^(\w+)\s*(>=|<=|!=|=|>|<|\bcontains\b)\s*(.+)$", re.IGNORECASE)
+    RECENT_RE = re.compile(r"^(\w+)\s+in\s+last\s+(\d+(?:\.\d+)?)\s*(\w*)$", re.IGNORECASE)
+    FIELDS = ("title", "artist", "album", "genre", "duration", "size", "added")
+    NUMERIC_UNITS = {
+        "duration": {
+            "": 1, "s": 1, "sec": 1, "secs": 1, "second": 1, "seconds": 1,
+            "m": 60, "min": 60, "mins": 60, "minute": 60, "minutes": 60,
+            "h": 3600, "hr": 3600, "hrs": 3600, "hour": 3600, "hours": 3600,
+        },
+        "size": {
+            "": 1, "b": 1, "byte": 1, "bytes": 1,
+            "k": 1024, "kb": 1024, "m": 1024 ** 2, "mb": 1024 ** 2, "g": 1024 ** 3, "gb": 1024 ** 3,
+        },
+    }
+    AGE_UNITS = {"": 86400, "hour": 3600, "hours": 3600, "day": 86400, "days": 86400, "week": 604800, "weeks": 604800}
+
+    def __init__(self, text):
+        self.text = text.strip()
+        tokens = self.SPLIT_RE.split(self.text)
+        joiners = {joiner.lower() for joiner in tokens[1::2]}
+        if len(joiners) > 1:
+            raise ValueError("Rules can use 'and' or 'or', but not both.")
+        self.match_all = joiners != {"or"}
+        self.conditions = [self._parse_condition(part.strip()) for part in tokens[::2]]
+
+    def _parse_condition(self, text):
+        if match := self.RECENT_RE.match(text):
+            field, amount, unit = match.group(1).lower(), float(match.group(2)), match.group(3).lower()
+            if field != "added" or unit not in self.AGE_UNITS:
+                raise ValueError(f"Can't understand '{text}'.")
+            return (field, "within", amount * self.AGE_UNITS[unit])
+        match = self.CONDITION_RE.match(text)
+        if not match or match.group(1).lower() not in self.FIELDS:
+            raise ValueError(f"Can't understand '{text}'.")
+        field, op, value = match.group(1).lower(), match.group(2).lower(), match.group(3).strip().strip("'\"")
+        if field in self.NUMERIC_UNITS:
+            if op == "contains":
+                raise ValueError(f"'contains' only works on text fields, not {field}.")
+            number = re.match(r"^(\d+(?:\.\d+)?)\s*(\w*)$", value)
+            units = self.NUMERIC_UNITS[field]
+            if not number or number.group(2).lower() not in units:
+                raise ValueError(f"'{value}' is not a valid {field}.")
+            value = float(number.group(1)) * units[number.group(2).lower()]
+        elif field == "added":
+            raise ValueError("Use 'added in last N days' for the date added.")
+        elif op not in ("=", "!=", "contains"):
+            raise ValueError(f"'{op}' only works on duration and size, not {field}.")
+        return (field, op, value)
+
+    def _check(self, condition, meta, now):
+        field, op, value = condition
+        actual = meta.get(field)
+        if op == "within":
+            return actual is not None and actual >= now - value
+        if isinstance(value, float):
+            if actual is None: return False
+            return {"=": actual == value, "!=": actual != value, ">": actual > value, "<": actual < value,
+                    ">=": actual >= value, "<=": actual <= value}[op]
+        actual = str(actual or "").lower()
+        value = value.lower()
+        if op == "contains": return value in actual
+        if op == "=": return actual == value
+        return actual != value
+
+    def matches(self, meta, now=None):
+        if meta is None: return False
+        now = now or time.time()
+        results = (self._check(condition, meta, now) for condition in self.conditions)
+        return all(results) if self.match_all else any(results)
+
+    def expiry_times(self, meta):
+        """ Times at which a time-relative condition this file satisfies stops holding. """
+        return [meta["added"] + value for field, op, value in self.conditions if op == "within" and meta.get("added")]
+
+    def candidates(self, metadata):
+        """ Narrows the files worth evaluating using the metadata index, or returns None to check everything. """
+        if not self.match_all: return None
+        for field, op, value in self.conditions:
+            if op == "=" and (found := metadata.lookup(field, value)) is not None:
+                return found
+        return None
+
+class Playlist:
+    """ A saved playlist (a fixed list of files) or a smart playlist (membership driven by a SmartRule). """
+    def __init__(self, name, items=None, rule=None):
+        self.name = name
+        self.rule = SmartRule(rule) if rule else None
+        self.items = list(items or [])
+        self.members = set(self.items)
+        self.expiry = []
+
+    @property
+    def is_smart(self):
+        return self.rule is not None
+
+    def to_dict(self):
+        if self.is_smart:
+            return {"name": self.name, "rule": self.rule.text, "members": sorted(self.members)}
+        return {"name": self.name, "items": self.items}
+
+class PlaylistStore:
+    """ Persists a tab's saved and smart playlists and keeps smart membership current incrementally. """
+    def __init__(self, store_file, metadata):
+        self.store_file = store_file
+        self.metadata = metadata
+        self.playlists = {}
+        self.load()
+
+    def load(self):
+        data = []
+        if os.path.exists(self.store_file):
+            try:
+                with open(self.store_file, "r", encoding="utf-8") as f: data = json.load(f)
+            except (json.JSONDecodeError, IOError):
+                data = []
+        for entry in data:
+            try:
+                playlist = Playlist(entry["name"], entry.get("items"), entry.get("rule"))
+            except (KeyError, ValueError):
+                continue
+            if playlist.is_smart:
+                playlist.members = set(entry.get("members", []))
+                for filepath in playlist.members: self._track_expiry(playlist, filepath)
+            self.playlists[playlist.name] = playlist
+
+    def save(self):
+        try:
+            with open(self.store_file, "w", encoding="utf-8") as f:
+                json.dump([playlist.to_dict() for playlist in self.playlists.values()], f, indent=4)
+        except IOError:
+            pass
+
+    def names(self):
+        return list(self.playlists)
+
+    def create_playlist(self, name, items):
+        self.playlists[name] = Playlist(name, items)
+        self.save()
+
+    def create_smart_playlist(self, name, rule_text):
+        """ Builds a smart playlist, evaluating its rule once. Raises ValueError for a bad rule. """
+        playlist = Playlist(name, rule=rule_text)
+        candidates = playlist.rule.candidates(self.metadata)
+        for filepath in (self.metadata.items if candidates is None else candidates):
+            self._evaluate(playlist, filepath)
+        self.playlists[name] = playlist
+        self.save()
+
+    def delete(self, name):
+        if self.playlists.pop(name, None):
+            self.save()
+
+    def _track_expiry(self, playlist, filepath):
+        if meta := self.metadata.get(filepath):
+            for expires_at in playlist.rule.expiry_times(meta):
+                heapq.heappush(playlist.expiry, (expires_at, filepath))
+
+    def _evaluate(self, playlist, filepath, now=None):
+        """ Re-checks one file against a smart playlist. Returns True if its membership changed. """
+        was_member = filepath in playlist.members
+        if playlist.rule.matches(self.metadata.get(filepath), now):
+            playlist.members.add(filepath)
+            if not was_member: self._track_expiry(playlist, filepath)
+            return not was_member
+        playlist.members.discard(filepath)
+        return was_member
+
+    def item_updated(self, filepath):
+        """ Call when a file is added to the library or its metadata changes. Returns the playlists that changed. """
+        return [p.name for p in self.playlists.values() if p.is_smart and self._evaluate(p, filepath)]
+
+    def item_replaced(self, filepath, replacement):
+        """ Swaps a file for another in saved playlists, e.g. when merging duplicates. """
+        changed = []
+        for playlist in self.playlists.values():
+            if not playlist.is_smart and filepath in playlist.members and replacement not in playlist.members:
+                playlist.items[playlist.items.index(filepath)] = replacement
+                playlist.members.add(replacement)
+                changed.append(playlist.name)
+        return changed
+
+    def item_removed(self, filepath):
+        changed = []
+        for playlist in self.playlists.values():
+            if filepath in playlist.members:
+                playlist.members.discard(filepath)
+                if filepath in playlist.items: playlist.items.remove(filepath)
+                changed.append(playlist.name)
+        return changed
+
+    def expire(self, now=None):
+        """ Drops files that have aged out of time-relative smart playlists. Returns the playlists that changed. """
+        now = now or time.time()
+        changed = set()
+        for playlist in self.playlists.values():
+            while playlist.expiry and playlist.expiry[0][0] <= now:
+                _, filepath = heapq.heappop(playlist.expiry)
+                if filepath in playlist.members and self._evaluate(playlist, filepath, now):
+                    changed.add(playlist.name)
+        return list(changed)
+
+    def ordered_members(self, name, library_data):
+        """ Returns a playlist's files in play order. """
+        playlist = self.playlists.get(name)
+        if playlist is None: return list(library_data)
+        if playlist.is_smart: return [fp for fp in library_data if fp in playlist.members]
+        return list(playlist.items)
+
+# ----------------------------
+# Duplicate Detection
+# ----------------------------
+class DuplicateFinder:
+    """ Finds duplicate media in stages: file size, then a partial-content hash, then a full hash.
+        Pictures are also grouped by a perceptual hash of their library thumbnail. """
+    PARTIAL_HASH_BYTES = 64 * 1024
+    CHUNK_SIZE = 1024 * 1024
+    SIMILARITY_THRESHOLD = 4  # Max differing bits for two pictures to count as similar.
+
+    def __init__(self, max_workers=4):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.coordinator = ThreadPoolExecutor(max_workers=1)
+
+    @staticmethod
+    def perceptual_hash(image):
+        """ 64-bit difference hash: compares neighbouring pixels of a 9x8 grayscale copy. """
+        pixels = list(image.convert("L").resize((9, 8), Image.Resampling.LANCZOS).getdata())
+        value = 0
+        for row in range(8):
+            for col in range(8):
+                value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+        return value
+
+    @staticmethod
+    def _size(filepath):
+        """ File size, or None for missing and empty files (empty files aren't duplicates of each other). """
+        try:
+            return os.path.getsize(filepath) or None
+        except OSError:
+            return None
+
+    def _partial_hash(self, filepath):
+        """ Hashes the head and tail of a file, which is enough to tell most same-size files apart. """
+        try:
+            with open(filepath, "rb") as f:
+                digest = hashlib.blake2b(f.read(self.PARTIAL_HASH_BYTES))
+                if os.fstat(f.fileno()).st_size > 2 * self.PARTIAL_HASH_BYTES:
+                    f.seek(-self.PARTIAL_HASH_BYTES, os.SEEK_END)
+                digest.update(f.read(self.PARTIAL_HASH_BYTES))
+            return digest.hexdigest()
+        except OSError:
+            return None
+
+    def _full_hash(self, filepath):
+        try:
+            digest = hashlib.blake2b()
+            with open(filepath, "rb") as f:
+                while chunk := f.read(self.CHUNK_SIZE): digest.update(chunk)
+            return digest.hexdigest()
+        except OSError:
+            return None
+
+    def _split(self, groups, key_func):
+        """ Splits each candidate group by key_func (run in the pool), keeping only groups with 2+ files. """
+        filepaths = [fp for group in groups for fp in group]
+        group_of = {fp: index for index, group in enumerate(groups) for fp in group}
+        buckets = {}
+        for filepath, key in zip(filepaths, self.pool.map(key_func, filepaths)):
+            if key is not None: buckets.setdefault((group_of[filepath], key), []).append(filepath)
+        return [bucket for bucket in buckets.values() if len(bucket) > 1]
+
+    def find_identical(self, filepaths):
+        groups = [list(dict.fromkeys(filepaths))]
+        for key_func in (self._size, self._partial_hash, self._full_hash):
+            groups = self._split(groups, key_func)
+        return groups
+
+    def find_similar(self, perceptual_hashes):
+        """ Groups pictures whose hashes differ by at most SIMILARITY_THRESHOLD bits from the group's first picture.
+            Matches are not chained, so every member really is close to that picture.
+            Hashes are split into THRESHOLD + 1 bands; similar hashes must share at least one band exactly,
+            so only files sharing a band are compared. """
+        bands = self.SIMILARITY_THRESHOLD + 1
+        width = -(-64 // bands)
+        def band_keys(value):
+            return [(band, (value >> (band * width)) & ((1 << width) - 1)) for band in range(bands)]
+
+        buckets = {}
+        for filepath, value in perceptual_hashes.items():
+            for key in band_keys(value): buckets.setdefault(key, []).append(filepath)
+
+        assigned = set()
+        groups = []
+        for filepath, value in perceptual_hashes.items():
+            if filepath in assigned: continue
+            assigned.add(filepath)
+            group = [filepath]
+            for key in band_keys(value):
+                for other in buckets[key]:
+                    if other not in assigned and bin(value ^ perceptual_hashes[other]).count("1") <= self.SIMILARITY_THRESHOLD:
+                        assigned.add(other)
+                        group.append(other)
+            if len(group) > 1: groups.append(group)
+        return groups
+
+    def find(self, filepaths, perceptual_hashes=None):
+        """ Returns a list of (kind, files) duplicate groups, where kind is 'identical' or 'similar'. """
+        identical = self.find_identical(filepaths)
+        # Pictures already reported as identical are left out of the similarity pass, so no file
+        # shows up in two groups (a rescan after merging picks up any remaining look-alikes).
+        reported = {fp for group in identical for fp in group}
+        hashes = {fp: value for fp, value in (perceptual_hashes or {}).items() if fp not in reported}
+        return [("identical", group) for group in identical] + [("similar", group) for group in self.find_similar(hashes)]
+
+    def find_async(self, filepaths, perceptual_hashes=None):
+        """ Runs find() off the UI thread and returns a Future. """
+        return self.coordinator.submit(self.find, list(filepaths), dict(perceptual_hashes or {}))
+
+    def shutdown(self):
+        self.coordinator.shutdown(wait=False, cancel_futures=True)
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+# ----------------------------
+# Session State
+# ----------------------------
+class SessionState:
+    """ Persists playback and UI state between runs. Writes are atomic (temp file + rename) and throttled. """
+    MIN_WRITE_INTERVAL = 5.0  # seconds
+
+    def __init__(self, state_file):
+        self.state_file = state_file
+        self.state = {}
+        self.dirty = False
+        self.last_write = 0.0
+
+    def load(self):
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f: state = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+        self.state = state if isinstance(state, dict) else {}
+        return dict(self.state)
+
+    def update(self, state):
+        if any(self.state.get(key) != value for key, value in state.items()):
+            self.state.update(state)
+            self.dirty = True
+        self.flush()
+
+    def flush(self, force=False):
+        """ Writes pending changes, at most once per MIN_WRITE_INTERVAL unless forced. """
+        if not self.dirty: return
+        if not force and time.monotonic() - self.last_write < self.MIN_WRITE_INTERVAL: return
+        temp_file = f"{self.state_file}.tmp"
+        try:
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump(self.state, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, self.state_file)
+        except OSError:
+            return
+        self.dirty = False
+        self.last_write = time.monotonic()
+
+# ----------------------------
+# Local Control API
+# ----------------------------
+class ControlServer:
+    """ A small loopback HTTP server for scripting the player.
+
+        The asyncio loop runs in a side thread and never touches Tk. Commands are put on a queue that the
+        Tk loop drains (see ModernMediaPlayer.process_control_commands); results come back through futures.
+        GET /events streams playback-state updates as server-sent events.
+
+        Every request must carry the per-run token from CONTROL_TOKEN_FILE (Authorization: Bearer <token>).
+        Browser requests are refused: the Host must be the loopback address, any Origin header is rejected,
+        and POSTs must be application/json, which a page can't send cross-origin without a preflight. """
+    GET_COMMANDS = {"state", "search"}
+    POST_COMMANDS = {"play", "pause", "seek", "next", "previous", "queue", "import"}
+    MAX_BODY_BYTES = 1024 * 1024
+    COMMAND_TIMEOUT = 10.0      # seconds to wait for the UI thread
+    EVENT_BACKLOG = 64          # events buffered per slow client before the oldest are dropped
+    KEEPALIVE_INTERVAL = 15.0   # seconds between comments sent to idle /events clients
+
+    def __init__(self, host=CONTROL_HOST, port=CONTROL_PORT, token_file=CONTROL_TOKEN_FILE):
+        self.host = host
+        self.port = port
+        self.token_file = token_file
+        self.token = secrets.token_urlsafe(32)
+        self.allowed_hosts = {f"127.0.0.1:{port}", f"localhost:{port}"}
+        self.commands = queue.Queue()
+        self.subscribers = set()
+        self.last_event = None
+        self.import_extensions = {}
+        self.wrote_token = False
+        self.loop = None
+        self.thread = None
+
+    def start(self, import_extensions):
+        """ import_extensions maps each lower-case tab name to the file extensions it accepts. """
+        self.import_extensions = dict(import_extensions)
+        self.thread = threading.Thread(target=self._run, name="control-server", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.loop and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        # Another instance may own the port and the token file; only remove a file this one wrote.
+        if self.wrote_token:
+            try:
+                os.remove(self.token_file)
+            except OSError:
+                pass
+
+    def _write_token(self):
+        """ Writes this run's token where local scripts can read it, readable by the current user only. """
+        try:
+            os.remove(self.token_file)
+        except OSError:
+            pass
+        fd = os.open(self.token_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f: f.write(self.token)
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            server = self.loop.run_until_complete(asyncio.start_server(self._handle_client, self.host, self.port))
+        except OSError as e:
+            print(f"Control server could not start on {self.host}:{self.port}: {e}")
+            return
+        # Write the token only once the port is ours, so a second instance can't replace the running one's token.
+        try:
+            self._write_token()
+        except OSError as e:
+            print(f"Control server could not write {self.token_file}: {e}")
+            server.close()
+            self.loop.run_until_complete(server.wait_closed())
+            return
+        self.wrote_token = True
+        self.loop.run_forever()
+
+    def publish(self, state):
+        """ Sends a playback-state event to every /events client. Safe to call from the Tk thread. """
+        if self.loop and self.loop.is_running():
+            payload = f"data: {json.dumps(state)}\n\n".encode("utf-8")
+            self.loop.call_soon_threadsafe(self._broadcast, payload)
+
+    def _broadcast(self, payload):
+        self.last_event = payload
+        for subscriber in self.subscribers:
+            if subscriber.full(): subscriber.get_nowait()
+            subscriber.put_nowait(payload)
+
+    async def _handle_client(self, reader, writer):
+        try:
+            method, path, headers, args, body = await self._read_request(reader)
+            if rejection := self._check_request(method, headers):
+                await self._send_json(writer, *rejection)
+                return
+            if body:
+                body = json.loads(body)
+                if not isinstance(body, dict):
+                    raise ValueError("Request body must be a JSON object.")
+                args.update(body)
+            if method == "GET" and path == "events":
+                await self._stream_events(reader, writer)
+                return
+            allowed = self.GET_COMMANDS if method == "GET" else self.POST_COMMANDS if method == "POST" else set()
+            if path not in self.GET_COMMANDS | self.POST_COMMANDS:
+                await self._send_json(writer, 404, {"error": f"Unknown command '{path}'."})
+            elif path not in allowed:
+                await self._send_json(writer, 405, {"error": f"'{path}' does not support {method}."})
+            else:
+                if path == "import":
+                    # Walking folders and checking files can take a while; keep it off both loops.
+                    args = await asyncio.to_thread(self._prepare_import, args)
+                future = concurrent.futures.Future()
+                self.commands.put((path, args, future))
+                result = await asyncio.wait_for(asyncio.wrap_future(future), self.COMMAND_TIMEOUT)
+                await self._send_json(writer, 202 if path == "import" else 200, result)
+        except (ValueError, LookupError) as e:
+            await self._send_json(writer, 400, {"error": str(e)})
+        except asyncio.TimeoutError:
+            await self._send_json(writer, 504, {"error": "The player did not respond in time."})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            await self._send_json(writer, 500, {"error": str(e)})
+        finally:
+            writer.close()
+
+    def _prepare_import(self, args):
+        """ Validates an import and expands its folder into a file list. Runs in a worker thread. """
+        tab = str(args.get("tab", "")).lower()
+        if tab not in self.import_extensions:
+            raise ValueError("import needs a 'tab': Music, Videos or Pictures.")
+        files = args.get("files", [])
+        if not isinstance(files, list):
+            raise ValueError("'files' must be a list of paths.")
+        extensions = self.import_extensions[tab]
+        filepaths = [os.path.abspath(str(fp)) for fp in files]
+        unsupported = [fp for fp in filepaths if not fp.lower().endswith(extensions)]
+        if unsupported:
+            raise ValueError(f"Not supported by {tab.capitalize()}: {', '.join(unsupported[:10])}")
+        if folder := args.get("folder"):
+            if not os.path.isdir(folder):
+                raise ValueError(f"Folder not found: {folder}")
+            for root, _, names in os.walk(folder):
+                filepaths.extend(os.path.abspath(os.path.join(root, name)) for name in sorted(names) if name.lower().endswith(extensions))
+        missing = [fp for fp in filepaths if not os.path.isfile(fp)]
+        if missing:
+            raise ValueError(f"Files not found: {', '.join(missing[:10])}")
+        return {"tab": tab, "files": filepaths}
+
+    def _check_request(self, method, headers):
+        """ Returns (status, error) for requests that must be refused, or None. """
+        if headers.get("host", "").lower() not in self.allowed_hosts:
+            return 403, {"error": "Requests must be addressed to the loopback host."}
+        if "origin" in headers:
+            return 403, {"error": "Browser requests are not accepted."}
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not secrets.compare_digest(token.strip(), self.token):
+            return 401, {"error": f"Missing or wrong token; send 'Authorization: Bearer <contents of {self.token_file}>'."}
+        if method == "POST" and headers.get("content-type", "").split(";")[0].strip().lower() != "application/json":
+            return 415, {"error": "POST requests must be sent as application/json."}
+        return None
+
+    async def _read_request(self, reader):
+        """ Parses an HTTP request into (method, command, headers, query args, raw body). """
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) != 3:
+            raise ValueError("Malformed request.")
+        method, target, _ = request_line
+        headers = {}
+        while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0))
+        if length > self.MAX_BODY_BYTES:
+            raise ValueError("Request body is too large.")
+        url = urllib.parse.urlsplit(target)
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), url.path.strip("/"), headers, dict(urllib.parse.parse_qsl(url.query)), body
+
+    async def _send_json(self, writer, status, data):
+        body = json.dumps(data).encode("utf-8")
+        reason = {200: "OK", 202: "Accepted", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+                  415: "Unsupported Media Type", 500: "Internal Server Error", 504: "Gateway Timeout"}[status]
+        writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def _stream_events(self, reader, writer):
+        subscriber = asyncio.Queue(maxsize=self.EVENT_BACKLOG)
+        self.subscribers.add(subscriber)
+        # Clients send nothing after the request, so EOF is the only sign one went away while no events are due.
+        closed = asyncio.ensure_future(self._until_eof(reader))
+        try:
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\nConnection: keep-alive\r\n\r\n")
+            if self.last_event: writer.write(self.last_event)
+            await writer.drain()
+            while True:
+                event = asyncio.ensure_future(subscriber.get())
+                done, _ = await asyncio.wait({event, closed}, timeout=self.KEEPALIVE_INTERVAL, return_when=asyncio.FIRST_COMPLETED)
+                if event in done:
+                    writer.write(event.result())
+                else:
+                    event.cancel()
+                    if closed in done: return
+                    # Half-open connections never report EOF; a write is what eventually fails on them.
+                    writer.write(b": keepalive\n\n")
+                await writer.drain()
+        finally:
+            closed.cancel()
+            self.subscribers.discard(subscriber)
+
+    @staticmethod
+    async def _until_eof(reader):
+        while await reader.read(4096): pass
+
 # ----------------------------
 # Modern Progress Bar
 # ----------------------------
@@ -218,10 +1042,17 @@ class MediaTab:
         self.media_type = media_type
         self.current_selection = None
         self.cards = {}
+        self.perceptual_hashes = {}
+        self.video_icon = None
         self.empty_label_container = None 
+        self.metadata = MetadataStore(f"{tab_name.lower()}_metadata.json")
+        self.playlists = PlaylistStore(f"{tab_name.lower()}_playlists.json", self.metadata)
+        self.all_items_label = f"All {media_type}"
+        self.active_playlist = None
         self.tab = main_app.tab_view.add(tab_name)
         self.setup_ui()
         self.load_library()
+        self.main_app.after(60000, self.check_playlist_expiry)
     
     def setup_ui(self):
         self.container = customtkinter.CTkFrame(self.tab, fg_color="transparent")
@@ -234,6 +1065,16 @@ class MediaTab:
         self.search_entry = customtkinter.CTkEntry(search_frame, placeholder_text=f"Search {self.media_type}...", border_width=0, fg_color="transparent")
         self.search_entry.pack(side="left", fill="x", expand=True, padx=(0, 10))
         self.search_entry.bind("<KeyRelease>", self.filter_media)
+
+        playlist_frame = customtkinter.CTkFrame(self.container, fg_color="transparent")
+        playlist_frame.pack(fill="x", pady=(0, 10))
+        self.playlist_menu = customtkinter.CTkOptionMenu(playlist_frame, values=[self.all_items_label], command=self.select_playlist, height=32, fg_color="gray15", button_color="gray20", button_hover_color="gray25", corner_radius=CORNER_RADIUS)
+        self.playlist_menu.pack(side="left", fill="x", expand=True)
+        playlist_btn_style = {"width": 32, "height": 32, "fg_color": "gray15", "hover_color": "gray25", "corner_radius": CORNER_RADIUS}
+        customtkinter.CTkButton(playlist_frame, text="✕", command=self.delete_playlist, **playlist_btn_style).pack(side="right", padx=(5, 0))
+        customtkinter.CTkButton(playlist_frame, text="⚡", command=self.create_smart_playlist, **playlist_btn_style).pack(side="right", padx=(5, 0))
+        customtkinter.CTkButton(playlist_frame, text="＋", command=self.save_playlist, **playlist_btn_style).pack(side="right", padx=(5, 0))
+        self.update_playlist_menu()
         
         self.scrollable_frame = customtkinter.CTkScrollableFrame(self.container, fg_color="transparent", scrollbar_button_color="gray25", scrollbar_button_hover_color="gray35")
         self.scrollable_frame.pack(fill="both", expand=True, pady=(0, 10))
@@ -245,16 +1086,80 @@ class MediaTab:
         customtkinter.CTkButton(button_frame, text="Add Files", height=40, fg_color=PRIMARY_COLOR, hover_color=PRIMARY_HOVER_COLOR, corner_radius=CORNER_RADIUS, font=("Segoe UI", 12, "bold"), command=self.add_files).grid(row=0, column=0, sticky="ew", padx=(0,5))
         customtkinter.CTkButton(button_frame, text="Remove", height=40, fg_color="#b91d1d", hover_color="#d62626", corner_radius=CORNER_RADIUS, font=("Segoe UI", 12, "bold"), command=self.remove_selected).grid(row=0, column=1, sticky="ew", padx=(5,0))
     
-    def filter_media(self, event):
+    def filter_media(self, event=None):
         search_term = self.search_entry.get().lower()
-        for filepath, card in self.cards.items():
+        for card in self.cards.values(): card.pack_forget()
+        for filepath in self.play_order():
+            if not (card := self.cards.get(filepath)): continue
             title_text = card.title_label.cget("text").lower()
             subtitle_text = card.subtitle_label.cget("text").lower() if hasattr(card, 'subtitle_label') else ""
             
             if search_term in title_text or search_term in subtitle_text:
                 card.pack(fill="x", pady=2)
-            else:
-                card.pack_forget()
+
+    def play_order(self):
+        """ Returns the files of the active playlist (or the whole library) in play order. """
+        if self.active_playlist is None: return self.library_data
+        return self.playlists.ordered_members(self.active_playlist, self.library_data)
+
+    # --- Playlists ---
+    def update_playlist_menu(self):
+        self.playlist_menu.configure(values=[self.all_items_label] + self.playlists.names())
+        self.playlist_menu.set(self.active_playlist or self.all_items_label)
+
+    def select_playlist(self, choice):
+        self.active_playlist = None if choice == self.all_items_label else choice
+        self.filter_media()
+
+    def ask_playlist_name(self):
+        name = customtkinter.CTkInputDialog(text="Playlist name:", title="New Playlist").get_input()
+        name = (name or "").strip()
+        if not name or name == self.all_items_label: return None
+        return name
+
+    def save_playlist(self):
+        """ Saves the currently listed (search-filtered) items as a regular playlist. """
+        if name := self.ask_playlist_name():
+            visible = [fp for fp in self.play_order() if fp in self.cards and self.cards[fp].winfo_manager()]
+            self.playlists.create_playlist(name, visible)
+            self.active_playlist = name
+            self.update_playlist_menu()
+            self.filter_media()
+
+    def create_smart_playlist(self):
+        if not (name := self.ask_playlist_name()): return
+        rule = customtkinter.CTkInputDialog(text="Rule, e.g. artist = X and duration > 5 min, or added in last 30 days:", title="Smart Playlist").get_input()
+        if not rule or not rule.strip(): return
+        try:
+            self.playlists.create_smart_playlist(name, rule)
+        except ValueError as e:
+            messagebox.showerror("Smart Playlist", str(e))
+            return
+        self.active_playlist = name
+        self.update_playlist_menu()
+        self.filter_media()
+
+    def delete_playlist(self):
+        if self.active_playlist:
+            self.playlists.delete(self.active_playlist)
+            self.active_playlist = None
+            self.update_playlist_menu()
+            self.filter_media()
+
+    def on_playlists_changed(self, changed):
+        if changed:
+            self.playlists.save()
+            if self.active_playlist in changed: self.filter_media()
+
+    def refresh_item(self, filepath):
+        """ Picks up re-tagged files so smart playlists stay current without a re-scan. """
+        if self.metadata.update(filepath):
+            self.metadata.save()
+            self.on_playlists_changed(self.playlists.item_updated(filepath))
+
+    def check_playlist_expiry(self):
+        self.on_playlists_changed(self.playlists.expire())
+        self.main_app.after(60000, self.check_playlist_expiry)
 
     def on_item_click(self, filepath):
         if self.current_selection and self.current_selection in self.cards:
@@ -265,12 +1170,20 @@ class MediaTab:
         self.main_app.play_media(filepath, self)
     
     def load_library(self):
+        """ Reads the saved library. The card list is built separately by build_library_view, so the app can resume playback first. """
         if os.path.exists(self.library_file):
             try:
                 with open(self.library_file, "r", encoding="utf-8") as f: self.library_data = json.load(f)
             except json.JSONDecodeError: 
                 self.library_data = []
-        self.refresh_media_list()
+
+    def build_library_view(self):
+        """ Builds the card list. Each card reads its file's tags once and also feeds them to the metadata store. """
+        updated = self.refresh_media_list(existing=True)
+        for filepath in self.metadata.prune(self.library_data):
+            updated.update(self.playlists.item_removed(filepath))
+        self.metadata.save()
+        if updated: self.playlists.save()
     
     def save_library(self):
         try:
@@ -299,15 +1212,18 @@ class MediaTab:
         )
         text_label.pack(pady=(10, 0))
 
-    def refresh_media_list(self):
+    def refresh_media_list(self, existing=False):
+        """ Rebuilds every card. Returns the names of playlists whose membership changed. """
         for widget in self.scrollable_frame.winfo_children(): widget.destroy()
         self.cards.clear()
         self.empty_label_container = None
 
+        updated = set()
         if not self.library_data:
             self.show_empty_message()
         else:
-            for filepath in self.library_data: self.create_media_card(filepath)
+            for filepath in self.library_data: updated.update(self.create_media_card(filepath, existing))
+        return updated
 
     def create_video_icon(self, size):
         image = Image.new("RGBA", size, (0, 0, 0, 0))
@@ -317,16 +1233,17 @@ class MediaTab:
         draw.polygon(triangle, fill="white")
         return image
 
-    def create_media_card(self, filepath):
+    def create_media_card(self, filepath, existing=False):
+        """ Creates the list card for a file and records its metadata. Returns the names of playlists that changed. """
         filename = os.path.basename(filepath)
         title, _ = os.path.splitext(filename)
-        subtitle, thumbnail = None, None
+        subtitle, thumbnail, tag = None, None, None
         
         if self.media_type == "Pictures":
             try:
-                img = Image.open(filepath)
-                img.thumbnail((60, 60), Image.Resampling.LANCZOS)
-                thumbnail = customtkinter.CTkImage(light_image=img, dark_image=img, size=(60, 60))
+                img = self.main_app.images.decode(filepath, (60, 60))
+                self.perceptual_hashes[filepath] = DuplicateFinder.perceptual_hash(img)
+                thumbnail = self.main_app.images.card_thumbnail(img, (60, 60))
                 subtitle = f"{img.width}x{img.height}"
             except Exception: pass
         elif self.media_type == "Music":
@@ -335,12 +1252,15 @@ class MediaTab:
                 title = tag.title or title
                 subtitle = tag.artist or "Unknown Artist"
                 if album_art := self.main_app.player.get_album_art_pil(tag):
-                    album_art.thumbnail((60, 60), Image.Resampling.LANCZOS)
-                    thumbnail = customtkinter.CTkImage(light_image=album_art, dark_image=album_art, size=(60, 60))
+                    try:
+                        thumbnail = self.main_app.images.card_thumbnail(self.main_app.images.reduce(album_art, (60, 60)), (60, 60))
+                    except Exception:
+                        pass
         elif self.media_type == "Videos":
             try:
-                icon_image = self.create_video_icon((60, 60))
-                thumbnail = customtkinter.CTkImage(light_image=icon_image, dark_image=icon_image, size=(60, 60))
+                if self.video_icon is None:
+                    self.video_icon = self.main_app.images.card_thumbnail(self.create_video_icon((60, 60)), (60, 60))
+                thumbnail = self.video_icon
                 size = os.path.getsize(filepath)
                 for unit in ['B', 'KB', 'MB', 'GB']:
                     if size < 1024.0:
@@ -350,29 +1270,120 @@ class MediaTab:
         
         card = MediaCard(self.scrollable_frame, filepath, thumbnail, title, subtitle, self.on_item_click)
         card.pack(fill="x", pady=2)
+        if filepath == self.current_selection: card.set_selected(True)
         self.cards[filepath] = card
+        return self.track_metadata(filepath, tag, existing)
+
+    def track_metadata(self, filepath, tag=None, existing=False):
+        """ Records a file in the metadata store and re-checks smart playlists if it changed. """
+        if self.metadata.update(filepath, tag, existing):
+            return self.playlists.item_updated(filepath)
+        return []
+
+    def scroll_position(self):
+        return self.scrollable_frame._parent_canvas.yview()[0]
+
+    def set_scroll_position(self, fraction):
+        self.scrollable_frame._parent_canvas.yview_moveto(fraction)
     
     def add_files(self):
         if filepaths := filedialog.askopenfilenames(title="Select Files", filetypes=self.file_types):
-            new_files = [fp for fp in filepaths if fp not in self.library_data]
-            if new_files:
-                if self.empty_label_container:
-                    self.empty_label_container.destroy()
-                    self.empty_label_container = None
-                self.library_data.extend(new_files)
-                self.save_library()
-                for filepath in new_files: self.create_media_card(filepath)
+            self.import_files(filepaths)
+
+    def extensions(self):
+        return tuple(pattern.lstrip("*").lower() for _, patterns in self.file_types for pattern in patterns.split())
+
+    def import_files(self, filepaths, on_progress=None):
+        """ Adds files that aren't in the library yet and returns them. Their cards are built in batches
+            between UI events; on_progress(done, total) is called after each batch. """
+        known = set(self.library_data)
+        new_files = list(dict.fromkeys(fp for fp in filepaths if fp not in known))
+        if new_files:
+            if self.empty_label_container:
+                self.empty_label_container.destroy()
+                self.empty_label_container = None
+            self.library_data.extend(new_files)
+            self.save_library()
+            self.main_app.after(1, lambda: self._create_cards_in_batches(new_files, 0, set(), on_progress))
+        return new_files
+
+    def _create_cards_in_batches(self, filepaths, start, changed, on_progress):
+        library = set(self.library_data)
+        end = min(start + CARD_BATCH_SIZE, len(filepaths))
+        for filepath in filepaths[start:end]:
+            # Skip files removed from the library while the import was still running.
+            if filepath in library and filepath not in self.cards:
+                changed.update(self.create_media_card(filepath))
+        if on_progress: on_progress(end, len(filepaths))
+        if end < len(filepaths):
+            self.main_app.after(1, lambda: self._create_cards_in_batches(filepaths, end, changed, on_progress))
+            return
+        self.metadata.save()
+        if changed: self.playlists.save()
+        if self.active_playlist: self.filter_media()
     
     def remove_selected(self):
         if self.current_selection and self.current_selection in self.library_data:
-            self.library_data.remove(self.current_selection)
-            self.save_library()
-            if self.current_selection in self.cards:
-                self.cards[self.current_selection].destroy()
-                del self.cards[self.current_selection]
-            self.current_selection = None
-            if not self.library_data:
-                self.show_empty_message()
+            self.remove_items([self.current_selection])
+
+    def remove_items(self, filepaths, replacement=None):
+        """ Removes files from the library. Saved playlists get the replacement file in their place, if given. """
+        filepaths = [fp for fp in filepaths if fp in self.library_data]
+        if not filepaths: return
+        changed = set()
+        for filepath in filepaths:
+            self.library_data.remove(filepath)
+            self.metadata.remove(filepath)
+            self.perceptual_hashes.pop(filepath, None)
+            self.main_app.images.forget(filepath)
+            if replacement: changed.update(self.playlists.item_replaced(filepath, replacement))
+            changed.update(self.playlists.item_removed(filepath))
+            if filepath in self.cards:
+                self.cards[filepath].destroy()
+                del self.cards[filepath]
+            if filepath == self.current_selection:
+                self.current_selection = None
+        self.save_library()
+        self.metadata.save()
+        self.on_playlists_changed(changed)
+        if not self.library_data:
+            self.show_empty_message()
+
+# ----------------------------
+# Duplicates Window
+# ----------------------------
+class DuplicatesWindow(customtkinter.CTkToplevel):
+    """ Lists duplicate groups and lets the user keep one file from each, removing the rest from the library. """
+    def __init__(self, main_app, groups):
+        super().__init__(main_app)
+        self.main_app = main_app
+        self.title("Duplicates")
+        self.geometry("720x520")
+        self.configure(fg_color=BG_COLOR)
+        self.transient(main_app)
+
+        self.scrollable_frame = customtkinter.CTkScrollableFrame(self, fg_color="transparent", scrollbar_button_color="gray25", scrollbar_button_hover_color="gray35")
+        self.scrollable_frame.pack(fill="both", expand=True, padx=GENERAL_PADDING, pady=GENERAL_PADDING)
+        if not groups:
+            customtkinter.CTkLabel(self.scrollable_frame, text="No duplicates found.", font=MAIN_FONT, text_color=TEXT_MUTED_COLOR).pack(pady=40)
+        for kind, files in groups: self.create_group(kind, files)
+
+    def create_group(self, kind, files):
+        group_frame = customtkinter.CTkFrame(self.scrollable_frame, fg_color="gray15", corner_radius=CORNER_RADIUS)
+        group_frame.pack(fill="x", pady=4)
+        heading = "Identical files" if kind == "identical" else "Similar pictures"
+        customtkinter.CTkLabel(group_frame, text=f"{heading} ({len(files)})", font=MAIN_FONT_BOLD, anchor="w").pack(fill="x", padx=12, pady=(8, 4))
+        for filepath in files:
+            row = customtkinter.CTkFrame(group_frame, fg_color="transparent")
+            row.pack(fill="x", padx=12, pady=2)
+            customtkinter.CTkButton(row, text="Keep", width=60, height=28, fg_color=PRIMARY_COLOR, hover_color=PRIMARY_HOVER_COLOR, corner_radius=CORNER_RADIUS,
+                                    command=lambda fp=filepath, frame=group_frame: self.keep(fp, files, frame)).pack(side="right")
+            customtkinter.CTkLabel(row, text=filepath, font=SMALL_FONT, text_color=TEXT_MUTED_COLOR, anchor="w").pack(side="left", fill="x", expand=True)
+        customtkinter.CTkFrame(group_frame, fg_color="transparent", height=6).pack()
+
+    def keep(self, filepath, files, group_frame):
+        self.main_app.merge_duplicates(filepath, files)
+        group_frame.destroy()
 
 # ----------------------------
 # Main Application
@@ -385,9 +1396,19 @@ class ModernMediaPlayer(customtkinter.CTk):
         self.minsize(1200, 700)
         
         self.player = VLCPlayer()
+        self.images = ImageManager()
+        self.duplicate_finder = DuplicateFinder()
+        self.session = SessionState("session.json")
+        self.play_queue = deque()
+        self.import_jobs = {}
+        self.next_import_job = 1
+        self.control_server = ControlServer()
+        self.last_published_state = None
+        self.startup_complete = False
         self.current_media_filepath = None
         self.current_media_tab = None
         self.current_album_art = None
+        self.current_start_ms = 0
         self.is_muted = False
         self.welcome_frame = None
         self.is_shuffle, self.repeat_mode = False, 0
@@ -401,7 +1422,12 @@ class ModernMediaPlayer(customtkinter.CTk):
         self.create_sidebar()
         self.create_main_panel()
         self.create_controls()
+        # Resume playback before the (slow) library lists are built.
+        self.restore_session()
+        self.after(0, self.finish_startup)
         self.update_progress()
+        self.control_server.start({tab.media_type.lower(): tab.extensions() for tab in self.media_tabs()})
+        self.process_control_commands()
         
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
         self.display_container.bind("<Configure>", self.on_resize)
@@ -423,6 +1449,8 @@ class ModernMediaPlayer(customtkinter.CTk):
         title_frame.pack_propagate(False)
         customtkinter.CTkLabel(title_frame, text="All", font=LARGE_TITLE_FONT, text_color=PRIMARY_COLOR).pack(side="left")
         customtkinter.CTkLabel(title_frame, text="Player", font=("Segoe UI", 32, "normal"), text_color=TEXT_COLOR).pack(side="left", padx=(8, 0))
+        self.duplicates_btn = customtkinter.CTkButton(title_frame, text="⧉", width=40, height=40, corner_radius=20, fg_color="transparent", hover_color="gray20", font=SYMBOL_FONT, text_color=TEXT_COLOR, command=self.find_duplicates)
+        self.duplicates_btn.pack(side="right")
         
         self.tab_view = customtkinter.CTkTabview(self.sidebar, fg_color="transparent", 
                                                  segmented_button_fg_color="gray20",
@@ -522,6 +1550,8 @@ class ModernMediaPlayer(customtkinter.CTk):
         btn_style = {"width": 150, "height": 50, "fg_color": "gray20", "hover_color": "gray25", "corner_radius": CORNER_RADIUS}
         customtkinter.CTkButton(image_buttons_frame, text="⏮ Previous", command=self.play_previous_image, **btn_style).pack(side="left", padx=20)
         customtkinter.CTkButton(image_buttons_frame, text="Next ⏭", command=self.play_next_image, **btn_style).pack(side="left", padx=20)
+        self.image_stats_label = customtkinter.CTkLabel(parent, text="", font=SMALL_FONT, text_color=TEXT_MUTED_COLOR)
+        self.image_stats_label.pack(side="bottom", pady=(0, 6))
 
     # --- Core App Logic ---
     def show_welcome_screen(self):
@@ -540,7 +1570,7 @@ class ModernMediaPlayer(customtkinter.CTk):
         self.now_playing_art_label.configure(image=None)
         self.current_album_art = None
 
-    def play_media(self, filepath, tab_instance):
+    def play_media(self, filepath, tab_instance, start_ms=0, paused=False):
         if self.welcome_frame:
             self.welcome_frame.destroy()
             self.welcome_frame = None
@@ -548,6 +1578,8 @@ class ModernMediaPlayer(customtkinter.CTk):
         self.clear_display_area()
         self.current_media_filepath = filepath
         self.current_media_tab = tab_instance
+        self.current_start_ms = start_ms
+        tab_instance.refresh_item(filepath)
         
         # --- FIX: REMOVED THE REPEATED EVENT ATTACHMENT FROM HERE ---
 
@@ -558,25 +1590,23 @@ class ModernMediaPlayer(customtkinter.CTk):
             self.controls_container.pack(fill="both", expand=True)
             if tab_instance.media_type == "Music": self.display_music(filepath)
             else: self.display_video(filepath)
-            self.player.play(filepath)
-            self.play_pause_btn.configure(text="⏸")
+            self.player.play(filepath, start_ms, paused)
+            self.play_pause_btn.configure(text="▶" if paused else "⏸")
         
         self.progress_bar.set(0)
+        self.time_label.configure(text=self.format_time(start_ms))
+        self.save_session()
     
     def display_picture(self, filepath):
         try:
-            pil_image = Image.open(filepath)
             self.update_idletasks()
             dw, dh = self.display_container.winfo_width(), self.display_container.winfo_height()
-            iw, ih = pil_image.size
-            if iw > dw or ih > dh:
-                ratio = min(dw / iw, dh / ih)
-                new_size = (int(iw * ratio), int(ih * ratio))
-                pil_image = pil_image.resize(new_size, Image.Resampling.LANCZOS)
+            pil_image = self.images.load(filepath, (dw, dh))
             
-            ctk_image = customtkinter.CTkImage(light_image=pil_image, dark_image=pil_image, size=pil_image.size)
+            ctk_image = self.images.ctk_image(pil_image, pil_image.size, cached=True)
             self.image_label.configure(image=ctk_image)
             self.image_label.pack(fill="both", expand=True)
+            self.image_stats_label.configure(text=self.images.stats_text())
         except Exception as e:
             self.image_label.configure(image=None, text=f"Error displaying image: {e}")
             self.image_label.pack(fill="both", expand=True)
@@ -591,11 +1621,16 @@ class ModernMediaPlayer(customtkinter.CTk):
         
         self.set_now_playing_text(title, artist)
         
-        self.current_album_art = self.player.get_album_art_pil(tag)
+        if album_art := self.player.get_album_art_pil(tag):
+            try:
+                album_art = self.images.reduce(album_art, ALBUM_ART_MAX_SIZE)
+            except Exception:
+                album_art = None
+        self.current_album_art = self.images.track(album_art) if album_art else None
         if self.current_album_art:
             thumb_img = self.current_album_art.copy()
             thumb_img.thumbnail((60, 60), Image.Resampling.LANCZOS)
-            ctk_thumb = customtkinter.CTkImage(light_image=thumb_img, dark_image=thumb_img, size=(60, 60))
+            ctk_thumb = self.images.ctk_image(thumb_img, (60, 60))
             self.now_playing_art_label.configure(image=ctk_thumb)
 
             self.create_music_backdrop(self.current_album_art)
@@ -619,7 +1654,7 @@ class ModernMediaPlayer(customtkinter.CTk):
         
         bg.paste(album_art_resized, ((dw - album_art_resized.width) // 2, (dh - album_art_resized.height) // 2), mask)
         
-        ctk_image = customtkinter.CTkImage(light_image=bg, dark_image=bg, size=(dw, dh))
+        ctk_image = self.images.ctk_image(bg, (dw, dh))
         self.image_label.configure(image=ctk_image)
     
     def display_video(self, filepath):
@@ -645,7 +1680,13 @@ class ModernMediaPlayer(customtkinter.CTk):
                 self.player.mediaplayer.play()
                 self.play_pause_btn.configure(text="⏸")
     
-    def play_next(self): self._play_adjacent_media(1, self.current_media_tab)
+    def play_next(self):
+        while self.play_queue:
+            filepath = self.play_queue.popleft()
+            if tab := self.find_tab(filepath):
+                tab.on_item_click(filepath)
+                return
+        self._play_adjacent_media(1, self.current_media_tab)
     def play_previous(self): self._play_adjacent_media(-1, self.current_media_tab)
     def play_next_image(self): self._play_adjacent_media(1, self.picture_tab)
     def play_previous_image(self): self._play_adjacent_media(-1, self.picture_tab)
@@ -653,7 +1694,8 @@ class ModernMediaPlayer(customtkinter.CTk):
     def _play_adjacent_media(self, direction, media_tab):
         if not (media_tab and self.current_media_filepath and media_tab.library_data): return
         try:
-            data = media_tab.library_data
+            data = media_tab.play_order()
+            if self.current_media_filepath not in data: data = media_tab.library_data
             if not data: return
             current_index = data.index(self.current_media_filepath)
             
@@ -712,6 +1754,8 @@ class ModernMediaPlayer(customtkinter.CTk):
                 self.progress_bar.set(current_time / total_duration)
                 self.time_label.configure(text=self.format_time(current_time))
                 self.duration_label.configure(text=self.format_time(total_duration))
+        self.save_session()
+        self.publish_playback_state()
         self.after(250, self.update_progress)
 
     def handle_media_end(self, event):
@@ -720,9 +1764,11 @@ class ModernMediaPlayer(customtkinter.CTk):
             self.after(100, lambda: self.play_media(self.current_media_filepath, self.current_media_tab))
         elif self.repeat_mode == 1: # Repeat All
             self.after(100, self.play_next)
+        elif self.play_queue:
+            self.after(100, self.play_next)
         else: # No repeat
             try:
-                data = self.current_media_tab.library_data
+                data = self.current_media_tab.play_order()
                 current_index = data.index(self.current_media_filepath)
                 if current_index < len(data) - 1:
                     self.after(100, self.play_next)
@@ -739,12 +1785,209 @@ class ModernMediaPlayer(customtkinter.CTk):
         if self.current_media_tab and self.current_media_tab.media_type == "Music" and self.current_album_art:
             self.create_music_backdrop(self.current_album_art)
 
+    # --- Session ---
+    def restore_session(self):
+        """ Restores settings and the last track at its saved offset. Only needs the saved library files, not the built lists. """
+        state = self.session.load()
+        volume = state.get("volume", 70)
+        self.volume_slider.set(volume)
+        self.player.set_volume(volume)
+        if state.get("muted"): self.toggle_mute()
+        if state.get("shuffle"): self.toggle_shuffle()
+        for _ in range(state.get("repeat", 0) % 3): self.toggle_repeat()
+        try:
+            if state.get("tab"): self.tab_view.set(state["tab"])
+        except ValueError:
+            pass
+
+        tab = next((t for t in self.media_tabs() if t.media_type == state.get("media_tab")), None)
+        filepath = state.get("media")
+        if not (tab and filepath and os.path.exists(filepath)): return
+        tab.current_selection = filepath
+        if tab.media_type == "Pictures":
+            # The picture is fitted to the display area, which has no size until the window is shown.
+            self.after(250, lambda: self.play_media(filepath, tab))
+        else:
+            self.play_media(filepath, tab, start_ms=state.get("position", 0), paused=not state.get("playing", True))
+
+    def finish_startup(self):
+        for tab in self.media_tabs(): tab.build_library_view()
+        scroll = self.session.state.get("scroll", {})
+        self.after(100, lambda: [tab.set_scroll_position(scroll.get(tab.media_type, 0)) for tab in self.media_tabs()])
+        self.startup_complete = True
+
+    def save_session(self, force=False):
+        """ Records the current state. SessionState throttles the actual disk writes. """
+        if not self.startup_complete: return
+        state = {
+            "tab": self.tab_view.get(),
+            "volume": int(self.volume_slider.get()),
+            "muted": self.is_muted,
+            "shuffle": self.is_shuffle,
+            "repeat": self.repeat_mode,
+            "scroll": {tab.media_type: tab.scroll_position() for tab in self.media_tabs()},
+            "media": self.current_media_filepath,
+            "media_tab": self.current_media_tab.media_type if self.current_media_tab else None,
+        }
+        if self.current_media_tab and self.current_media_tab.media_type != "Pictures":
+            state["playing"] = bool(self.player.is_playing())
+            position = self.player.get_time()
+            state["position"] = position if position > 0 else self.current_start_ms
+        self.session.update(state)
+        if force: self.session.flush(force=True)
+
+    # --- Control API ---
+    def process_control_commands(self):
+        """ Runs commands queued by the control server. Only this Tk-side loop touches the UI. """
+        while True:
+            try:
+                name, args, future = self.control_server.commands.get_nowait()
+            except queue.Empty:
+                break
+            if not future.set_running_or_notify_cancel(): continue
+            try:
+                future.set_result(self.handle_control_command(name, args))
+            except Exception as e:
+                future.set_exception(e)
+        self.after(50, self.process_control_commands)
+
+    def handle_control_command(self, name, args):
+        handlers = {
+            "state": lambda: None,
+            "play": lambda: self.control_play(args.get("path")),
+            "pause": self.control_pause,
+            "seek": lambda: self.control_seek(args),
+            "next": self.play_next,
+            "previous": self.play_previous,
+            "queue": lambda: self.control_queue(args),
+            "search": lambda: self.control_search(args.get("q", ""), int(args.get("limit", 50))),
+            "import": lambda: self.control_import(args),
+        }
+        result = handlers[name]()
+        return self.playback_state() if result is None else result
+
+    def find_tab(self, filepath):
+        return next((tab for tab in self.media_tabs() if filepath in tab.library_data), None)
+
+    def control_play(self, filepath):
+        if filepath:
+            if not (tab := self.find_tab(filepath)):
+                raise ValueError(f"'{filepath}' is not in the library.")
+            tab.on_item_click(filepath)
+        elif self.current_media_filepath and not self.player.is_playing():
+            self.toggle_play_pause()
+
+    def control_pause(self):
+        if self.player.is_playing(): self.toggle_play_pause()
+
+    def control_seek(self, args):
+        if "fraction" in args:
+            self.seek(min(max(float(args["fraction"]), 0.0), 1.0))
+        elif "position" in args:
+            self.player.set_time(max(int(args["position"]), 0))
+        else:
+            raise ValueError("seek needs a 'position' (ms) or a 'fraction' (0-1).")
+
+    def control_queue(self, args):
+        filepaths = args.get("paths") or ([args["path"]] if args.get("path") else [])
+        missing = [fp for fp in filepaths if not self.find_tab(fp)]
+        if missing:
+            raise ValueError(f"Not in the library: {', '.join(missing)}")
+        if args.get("clear"): self.play_queue.clear()
+        self.play_queue.extend(filepaths)
+        return {"queue": list(self.play_queue)}
+
+    def control_search(self, query, limit):
+        """ Matches the query against title, artist and album in every tab's metadata store. """
+        query = query.lower()
+        results = []
+        for tab in self.media_tabs():
+            for filepath in tab.library_data:
+                meta = tab.metadata.get(filepath) or {}
+                fields = (meta.get("title") or os.path.basename(filepath), meta.get("artist") or "", meta.get("album") or "")
+                if any(query in str(field).lower() for field in fields):
+                    results.append({"path": filepath, "tab": tab.media_type, "title": fields[0], "artist": meta.get("artist"), "album": meta.get("album")})
+                    if len(results) >= limit: return {"results": results}
+        return {"results": results}
+
+    def control_import(self, args):
+        """ Starts importing a file list the control server already validated. Returns at once with a job id;
+            progress shows up under 'imports' in the playback state until the job finishes. """
+        tab = next(t for t in self.media_tabs() if t.media_type.lower() == args["tab"])
+        job_id = str(self.next_import_job)
+        self.next_import_job += 1
+
+        def progress(done, total):
+            if done < total: self.import_jobs[job_id] = {"tab": tab.media_type, "done": done, "total": total}
+            else: self.import_jobs.pop(job_id, None)
+
+        added = tab.import_files(args["files"], progress)
+        if added: self.import_jobs[job_id] = {"tab": tab.media_type, "done": 0, "total": len(added)}
+        return {"job": job_id, "accepted": len(added), "skipped": len(args["files"]) - len(added)}
+
+    def playback_state(self):
+        playing_media = self.current_media_tab is not None and self.current_media_tab.media_type != "Pictures"
+        return {
+            "media": self.current_media_filepath,
+            "tab": self.current_media_tab.media_type if self.current_media_tab else None,
+            "title": self.now_playing_title.cget("text"),
+            "artist": self.now_playing_artist.cget("text").strip(),
+            "playing": bool(self.player.is_playing()),
+            "position": max(self.player.get_time(), 0) if playing_media else 0,
+            "duration": max(self.player.get_length(), 0) if playing_media else 0,
+            "volume": int(self.volume_slider.get()),
+            "muted": self.is_muted,
+            "shuffle": self.is_shuffle,
+            "repeat": ("off", "all", "one")[self.repeat_mode],
+            "queue": len(self.play_queue),
+            "imports": {job_id: dict(job) for job_id, job in self.import_jobs.items()},
+        }
+
+    def publish_playback_state(self):
+        """ Streams state to /events clients when it changes; the position is only compared to the second. """
+        state = self.playback_state()
+        comparable = dict(state, position=state["position"] // 1000)
+        if comparable != self.last_published_state:
+            self.last_published_state = comparable
+            self.control_server.publish(state)
+
+    # --- Duplicates ---
+    def media_tabs(self):
+        return [self.music_tab, self.video_tab, self.picture_tab]
+
+    def find_duplicates(self):
+        """ Hashes the whole library in the background and shows the duplicate groups when done. """
+        filepaths = [fp for tab in self.media_tabs() for fp in tab.library_data]
+        future = self.duplicate_finder.find_async(filepaths, self.picture_tab.perceptual_hashes)
+        self.duplicates_btn.configure(state="disabled", text="…")
+        self._poll_duplicates(future)
+
+    def _poll_duplicates(self, future):
+        if not future.done():
+            self.after(200, lambda: self._poll_duplicates(future))
+            return
+        self.duplicates_btn.configure(state="normal", text="⧉")
+        try:
+            DuplicatesWindow(self, future.result())
+        except Exception as e:
+            messagebox.showerror("Duplicates", f"Duplicate scan failed: {e}")
+
+    def merge_duplicates(self, keep, files):
+        """ Keeps one file of a duplicate group and removes the others from whichever library holds them. """
+        others = [fp for fp in files if fp != keep]
+        for tab in self.media_tabs():
+            replacement = keep if keep in tab.library_data else None
+            tab.remove_items([fp for fp in others if fp in tab.library_data], replacement)
+
     def format_time(self, ms):
         seconds = int(ms / 1000)
         return f"{seconds // 60:02d}:{seconds % 60:02d}"
     
     def on_closing(self):
+        self.save_session(force=True)
+        self.control_server.stop()
         self.player.stop()
+        self.duplicate_finder.shutdown()
         self.destroy()
 
 if __name__ == "__main__":